@@ -0,0 +1,216 @@
+# Loading, cleaning and summary code shared by the journal entry analyses
+import os
+import numpy as np
+import pandas as pd
+
+# Bump whenever clean_data() or COLUMNS change, so caches written by older
+# code are not read back
+CACHE_VERSION = 5
+
+# Only these columns are used by the analysis
+COLUMNS = ['Debit', 'Credit', 'EffectiveDate', 'EntryDate', 'BusinessUnit', 'Source']
+
+def read_excel_openpyxl(input_file, columns=COLUMNS):
+    # Stream plain cell values from a read-only workbook: values_only skips the
+    # per-cell wrapper objects and style lookups, and the DataFrame is built once.
+    # Rows are normalised to match pd.read_excel: short rows are padded, empty
+    # cells become NaN and trailing blank rows (e.g. formatted but empty) dropped
+    from openpyxl import load_workbook
+    wb = load_workbook(input_file, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        # Don't trust the sheet's stored dimensions, which some exporters get
+        # wrong (rows would be cut short); rows then come back ragged instead
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+        header = list(next(rows))
+        width = len(header)
+        positions = [header.index(col) for col in columns]
+        data = []
+        last_filled = 0
+        for row in rows:
+            if len(row) < width:
+                row = list(row) + [None] * (width - len(row))
+            data.append([np.nan if row[i] is None else row[i] for i in positions])
+            if any(v is not None for v in row):
+                last_filled = len(data)
+        del data[last_filled:]
+    finally:
+        wb.close() # read-only workbooks hold the file open until closed
+    return pd.DataFrame(data, columns=columns)
+
+def read_journal_entries(input_file, columns=COLUMNS):
+    # calamine (python-calamine) parses the workbook in Rust without building
+    # the full openpyxl DOM; fall back to openpyxl's streaming read-only mode
+    try:
+        return pd.read_excel(input_file, engine='calamine', usecols=columns,
+                             parse_dates=['EffectiveDate', 'EntryDate'])
+    except ImportError:
+        return read_excel_openpyxl(input_file, columns)
+
+def fast_counts(s):
+    # Equivalent of s.value_counts() for low-cardinality columns: count the
+    # integer category codes instead of hashing every string. The stable sort
+    # leaves ties in category order, which clean_data() sets to first
+    # appearance, matching value_counts
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype(pd.CategoricalDtype(pd.unique(s.dropna().to_numpy())))
+    cat = s.cat
+    codes = cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(cat.categories))
+    index = pd.Index(cat.categories, name=s.name)
+    return pd.Series(counts, index=index, name='count').sort_values(ascending=False, kind='stable')
+
+def format_counts(counts):
+    # Same layout as counts.to_string() (index name header, labels left-aligned,
+    # counts right-aligned) without pandas' generic column-width computation
+    labels = [str(label) for label in counts.index]
+    values = [str(value) for value in counts.to_numpy()]
+    label_width = max(map(len, labels), default=0)
+    value_width = max(map(len, values), default=0)
+    lines = [str(counts.index.name)] if counts.index.name is not None else []
+    lines += [f"{label:<{label_width}}    {value:>{value_width}}" for label, value in zip(labels, values)]
+    return '\n'.join(lines)
+
+def date_range(s):
+    # Min/max of a datetime column on the raw datetime64 array, ignoring NaT
+    values = s.to_numpy()
+    values = values[~np.isnat(values)]
+    if values.size == 0:
+        return pd.NaT, pd.NaT
+    return pd.Timestamp(values.min()), pd.Timestamp(values.max())
+
+def parse_dates(s):
+    # A fixed ISO8601 format skips per-value format inference, and cache
+    # memoizes repeated dates; values in any other layout are re-parsed with
+    # inference, which raises on anything that is not a date at all
+    parsed = pd.to_datetime(s, format='ISO8601', cache=True, errors='coerce')
+    retry = parsed.isna() & s.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(s[retry], format='mixed', cache=True)
+    return parsed
+
+def clean_data(df):
+    # Data Cleaning
+    # Each cleaned column is built once and the frame is assembled in a single
+    # step, rather than reassigning columns of df one by one
+    cleaned = {}
+
+    # Convert Debit/Credit to numeric, coercing errors to NaN and filling
+    # NaN with 0 for calculations in the same pass
+    for col in ('Debit', 'Credit'):
+        # (copy=True: the array may be a read-only view of df's own data)
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, copy=True)
+        values[np.isnan(values)] = 0.0
+        cleaned[col] = values
+
+    # Convert dates (no-op when the loader already parsed them)
+    for col in ('EffectiveDate', 'EntryDate'):
+        cleaned[col] = parse_dates(df[col]).to_numpy()
+
+    # Clean string columns
+    # (plain str.strip per value is much cheaper than the .str accessor); they
+    # have few distinct values, so store them as categoricals, with categories
+    # in order of first appearance so counting ties break like value_counts
+    for col in ('BusinessUnit', 'Source'):
+        values = np.array([v.strip() if isinstance(v, str) else str(v).strip()
+                           for v in df[col].to_numpy()], dtype=object)
+        cleaned[col] = pd.Categorical(values, categories=pd.unique(values))
+
+    return pd.DataFrame(cleaned, index=df.index)
+
+def load_and_clean(input_file, cache_file=None):
+    # Reuse the cleaned data from a previous run unless the workbook is newer;
+    # the cache name carries CACHE_VERSION so a change to the cleaning code
+    # never reads back stale output
+    if cache_file is None:
+        cache_file = f"{os.path.splitext(input_file)[0]}.v{CACHE_VERSION}.parquet"
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(input_file):
+        print(f"Reading cached data from {cache_file}...")
+        try:
+            return pd.read_parquet(cache_file, engine='pyarrow')
+        except Exception as e:
+            print(f"Ignoring unreadable cache {cache_file}: {e}")
+
+    print(f"Reading {input_file}...")
+    df = clean_data(read_journal_entries(input_file))
+    # Write to a temporary file and move it into place, so an interrupted
+    # write never leaves a truncated cache that looks newer than the workbook
+    tmp_file = cache_file + '.tmp'
+    try:
+        df.to_parquet(tmp_file, engine='pyarrow', compression='zstd')
+        os.replace(tmp_file, cache_file)
+    except (ImportError, OSError) as e:
+        print(f"Not caching cleaned data: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return df
+
+def basic_stats(df, debit_arr=None, credit_arr=None):
+    # Summary Statistics
+    # Debit/Credit have no NaN after cleaning, so reduce the raw arrays directly;
+    # callers that also use the arrays can pass them in to share them
+    if debit_arr is None:
+        debit_arr = df['Debit'].to_numpy()
+    if credit_arr is None:
+        credit_arr = df['Credit'].to_numpy()
+    effective_date_min, effective_date_max = date_range(df['EffectiveDate'])
+    entry_date_min, entry_date_max = date_range(df['EntryDate'])
+    return {
+        'row_count': len(df),
+        'effective_date_min': effective_date_min,
+        'effective_date_max': effective_date_max,
+        'entry_date_min': entry_date_min,
+        'entry_date_max': entry_date_max,
+        'total_debit': debit_arr.sum(),
+        'total_credit': credit_arr.sum(),
+        'bu_counts': fast_counts(df['BusinessUnit']),
+        'source_counts': fast_counts(df['Source']),
+    }
+
+def write_summary(output_dir, stats, benford=None):
+    # Assemble the whole report in memory and write it in one call; the
+    # Benford section is only included when a comparison frame is given
+    total_debit = stats['total_debit']
+    total_credit = stats['total_credit']
+    parts = [
+        "Basic Analysis Summary\n",
+        "======================\n\n",
+        f"Total Rows: {stats['row_count']}\n",
+        f"Effective Date Range: {stats['effective_date_min']} to {stats['effective_date_max']}\n",
+        f"Entry Date Range: {stats['entry_date_min']} to {stats['entry_date_max']}\n",
+        f"Total Debits: {total_debit:,.2f}\n",
+        f"Total Credits: {total_credit:,.2f}\n",
+        f"Net Difference (Debits + Credits): {total_debit + total_credit:,.2f}\n\n",
+
+        "Entries by Business Unit:\n",
+        format_counts(stats['bu_counts']),
+        "\n\n",
+
+        "Entries by Source:\n",
+        format_counts(stats['source_counts']),
+        "\n\n",
+    ]
+
+    if benford is not None:
+        parts += [
+            "Benford's Law Analysis (First Digit Frequencies):\n",
+            f"{'Digit':<6} {'Observed':<10} {'Expected':<10} {'Diff':<10}\n",
+            "-" * 40 + "\n",
+        ]
+        for digit, obs, exp in zip(benford.index, benford['Observed'].to_numpy(), benford['Expected'].to_numpy()):
+            diff = obs - exp
+            parts.append(f"{digit:<6} {obs:.4f}     {exp:.4f}     {diff:.4f}\n")
+
+        parts += [
+            "\nInterpretation:\n",
+            "Significant deviations from the expected Benford's Law frequencies may indicate anomalies or potential fraud.\n",
+            "However, certain legitimate accounting patterns (e.g., recurring identical amounts) can also cause deviations.\n",
+        ]
+
+    summary_file = os.path.join(output_dir, 'summary.txt')
+    with open(summary_file, 'w') as f:
+        f.write(''.join(parts))
+
+    print(f"Summary written to {summary_file}")
+    return summary_file
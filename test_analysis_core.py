@@ -0,0 +1,59 @@
+import re
+import zipfile
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from _analysis_core import COLUMNS, clean_data, read_excel_openpyxl
+
+pytest.importorskip('python_calamine')
+
+
+def write_workbook(path):
+    # 4 data rows (one fully blank in between) plus a formatted but empty row
+    # at the bottom, which openpyxl still yields and pd.read_excel drops
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['JEIdentifier'] + COLUMNS + ['JEDescription'])
+    ws.append([1, 10.5, None, '2014-07-01', '2014-07-02', ' HOTEL ', 'CHECK', 'x'])
+    ws.append([2, None, -3, '2014-08-01', '2014-08-02', None, 'CASH RECEIPT'])
+    ws.append([None] * 8)
+    ws.append([3, 7, None, '2014-09-01', '2014-09-02', 'FOOD SERVICE', 'CHECK'])
+    ws.append([4, 'bad', 2, '07/01/2014', '2014-10-02', 'HOTEL'])
+    ws['B10'].font = Font(bold=True)
+    wb.save(path)
+
+
+def break_dimensions(path):
+    # Rewrite the sheet's stored dimensions to a wrong, too small range
+    with zipfile.ZipFile(path) as src:
+        items = [(item, src.read(item.filename)) for item in src.infolist()]
+    with zipfile.ZipFile(path, 'w') as out:
+        for item, data in items:
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                data = re.sub(rb'<dimension ref="[^"]*"', b'<dimension ref="A1:C1"', data)
+            out.writestr(item, data)
+
+
+def load_both(path):
+    calamine = pd.read_excel(path, engine='calamine', usecols=COLUMNS,
+                             parse_dates=['EffectiveDate', 'EntryDate'])
+    return clean_data(calamine), clean_data(read_excel_openpyxl(path))
+
+
+def test_loaders_agree_on_blank_trailing_rows(tmp_path):
+    path = tmp_path / 'je.xlsx'
+    write_workbook(path)
+    expected, actual = load_both(path)
+    assert len(actual) == 5
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_loaders_agree_on_wrong_dimensions(tmp_path):
+    path = tmp_path / 'je.xlsx'
+    write_workbook(path)
+    break_dimensions(path)
+    expected, actual = load_both(path)
+    pd.testing.assert_frame_equal(actual, expected)